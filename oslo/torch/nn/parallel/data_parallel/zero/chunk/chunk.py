@@ -16,7 +16,7 @@
 
 from dataclasses import dataclass
 from enum import Enum
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 
 import torch
 import torch.distributed as dist
@@ -24,7 +24,11 @@ import torch.distributed as dist
 from oslo.torch.distributed.parallel_mode import ParallelMode
 from oslo.torch.distributed.parallel_context import ParallelContext
 
-from oslo.torch.nn.parallel.data_parallel.zero.utils import get_current_device
+from oslo.torch.nn.parallel.data_parallel.zero.utils import (
+    coalescing_manager,
+    get_current_device,
+    reduce_scatter_tensor,
+)
 
 
 class TensorState(Enum):
@@ -91,6 +95,20 @@ def alloc_storage(tensor: torch.Tensor) -> None:
         tensor.storage().resize_(tensor.numel())
 
 
+def _is_avg_op_supported(group) -> bool:
+    """Check if ``ReduceOp.AVG`` can be used in the collectives of the group.
+
+    Args:
+        group: The process group to check.
+
+    Returns:
+        bool: True if the backend of the group supports ``ReduceOp.AVG``, False otherwise.
+    """
+    return (
+        hasattr(dist.ReduceOp, "AVG") and dist.get_backend(group) == dist.Backend.NCCL
+    )
+
+
 class Chunk:
     _total_number = 0
     """
@@ -173,6 +191,8 @@ class Chunk:
         # each tensor is associated with a TensorInfo to track its meta info
         # (state, offset, end)
         self.tensors_info: Dict[torch.Tensor, TensorInfo] = {}
+        # (tensor, offset, end, shape) of each tensor, listed once the chunk is closed
+        self.tensors_info_list: List[Tuple[torch.Tensor, int, int, torch.Size]] = []
         # the total number of tensors in the chunk
         self.num_tensors = 0
 
@@ -202,7 +222,6 @@ class Chunk:
 
         # whether to record l2 norm for the gradient clipping calculation
         self.l2_norm_flag = False
-        self.l2_norm = None
 
     @property
     def memory_usage(self) -> Dict[str, int]:
@@ -281,27 +300,18 @@ class Chunk:
     @property
     def has_inf_or_nan(self) -> bool:
         """Check if the chunk has inf or nan values on CUDA."""
-        if self.is_gathered:
-            valid_tensor = self.cuda_global_chunk[: self.utilized_size]
-        else:
-            assert self.cuda_shard is not None  # only check on CUDA
-            valid_tensor = self.cuda_shard[: self.valid_end]
+        return bool(self.get_inf_or_nan_flag().item())
 
-        return (
-            torch.isinf(valid_tensor).any().item()
-            | torch.isnan(valid_tensor).any().item()
-        )
+    def get_inf_or_nan_flag(self) -> torch.Tensor:
+        """Get an int32 CUDA scalar which is 1 if the chunk has inf or nan values, without synchronizing with the host."""
+        valid_tensor = self.__get_valid_cuda_tensor()
+        return torch.logical_not(torch.isfinite(valid_tensor).all()).to(torch.int32)
 
-    def set_l2_norm(self) -> None:
-        """Record l2 norm of this chunks on CUDA."""
-        assert self.l2_norm is None, "you are calculating the l2 norm twice"
-        if self.is_gathered:
-            valid_tensor = self.cuda_global_chunk[: self.utilized_size]
-        else:
-            assert self.cuda_shard is not None  # calculate on CUDA
-            valid_tensor = self.cuda_shard[: self.valid_end]
-        chunk_l2_norm = valid_tensor.data.float().norm(2)
-        self.l2_norm = chunk_l2_norm.item() ** 2
+    def get_l2_norm_sqr(self) -> torch.Tensor:
+        """Get the squared l2 norm of this chunk as a CUDA scalar, without synchronizing with the host."""
+        valid_tensor = self.__get_valid_cuda_tensor()
+        chunk_l2_norm = torch.linalg.vector_norm(valid_tensor.data, dtype=torch.float)
+        return chunk_l2_norm.square()
 
     def append_tensor(self, tensor: torch.Tensor):
         """Add a tensor to the chunk.
@@ -342,6 +352,12 @@ class Chunk:
         # sanity check
         assert self.chunk_temp is not None
 
+        # the layout of the tensors is fixed from now on
+        self.tensors_info_list = [
+            (tensor, tensor_info.offset, tensor_info.end, tensor.shape)
+            for tensor, tensor_info in self.tensors_info.items()
+        ]
+
         # calculate the valid end for each shard
         if self.utilized_size <= self.shard_begin:
             self.valid_end = 0
@@ -370,12 +386,16 @@ class Chunk:
         if self.shard_device.type == "cpu":
             self.cuda_shard = None
 
-    def shard_move(self, device: torch.device, force_copy: bool = False):
+    def shard_move(
+        self, device: torch.device, force_copy: bool = False, non_blocking: bool = False
+    ):
         """Move the shard tensor in the chunk.
 
         Args:
             device: the device to which the shard will move
             force_copy: if True, copy function is called mandatorily
+            non_blocking: if True, the copy into the pinned cpu shard is asynchronous,
+                and the caller should synchronize before reading it
         """
         # sanity check
         assert not self.is_gathered
@@ -393,7 +413,10 @@ class Chunk:
             if self.cuda_shard:
                 return
 
-            self.cuda_shard = self.cpu_shard.to(get_current_device())
+            # a pinned shard is kept after the move, so the copy can be asynchronous
+            self.cuda_shard = self.cpu_shard.to(
+                get_current_device(), non_blocking=self.pin_memory
+            )
 
             if not self.pin_memory:
                 self.cpu_shard = None
@@ -403,7 +426,7 @@ class Chunk:
 
             if self.pin_memory:
                 if force_copy or not self.cpu_vis_flag:
-                    self.cpu_shard.copy_(self.cuda_shard)
+                    self.cpu_shard.copy_(self.cuda_shard, non_blocking=non_blocking)
                 # if cpu_shard has been visited
                 # copy operation is not need
             else:
@@ -430,19 +453,28 @@ class Chunk:
         if self.is_gathered:
             self.__scatter()
 
-    def reduce(self):
-        """Reduce scatter all the gradients. It's an operation done in CUDA."""
+    def reduce(self, average: bool = False):
+        """Reduce scatter all the gradients. It's an operation done in CUDA.
+
+        Args:
+            average (bool): if True, the reduced gradients are divided by the size of the process group
+        """
         # sanity check
         assert self.is_gathered
 
+        # fold the division into the collective when the backend supports it
+        fold_average = average and _is_avg_op_supported(self.torch_pg)
+        op = dist.ReduceOp.AVG if fold_average else dist.ReduceOp.SUM
+
         if self.pg_size == 1:
             # tricky code here
             # just move cuda_global_chunk to cuda_shard
             # the communication is not necessary
             self.__scatter()
+            average = False
         elif self.keep_gathered:
             # we use all-reduce here
-            dist.all_reduce(self.cuda_global_chunk, group=self.torch_pg)
+            dist.all_reduce(self.cuda_global_chunk, op=op, group=self.torch_pg)
         else:
             self.cuda_shard = torch.empty(
                 self.shard_size, dtype=self.dtype, device=get_current_device()
@@ -451,12 +483,88 @@ class Chunk:
             input_list = list(
                 torch.chunk(self.cuda_global_chunk, chunks=self.pg_size, dim=0)
             )
-            dist.reduce_scatter(self.cuda_shard, input_list, group=self.torch_pg)
+            dist.reduce_scatter(self.cuda_shard, input_list, op=op, group=self.torch_pg)
 
             free_storage(self.cuda_global_chunk)
             self.is_gathered = False
+
+        if average and not fold_average:
+            self.payload.div_(self.pg_size)
         self.__update_tensors_state(TensorState.HOLD)
 
+    @staticmethod
+    def reduce_coalesced(
+        chunks: List["Chunk"],
+        average: bool = False,
+        comm_dtype: Optional[torch.dtype] = None,
+    ) -> None:
+        """Reduce scatter the gradients of several chunks with coalesced collectives.
+        All the chunks should share the process group, the data type and the `keep_gathered` flag.
+        Each chunk is reduced in its own storage, so the peak memory is the same as reducing them one by one.
+
+        Args:
+            chunks (List[Chunk]): the gathered chunks to be reduced
+            average (bool): if True, the reduced gradients are divided by the size of the process group
+            comm_dtype (Optional[torch.dtype]): the data type used in the collective, e.g. torch.bfloat16.
+                The gradients are cast back to the data type of the chunks on arrival.
+                Defaults to None, which communicates in the data type of the chunks.
+        """
+        head = chunks[0]
+        for chunk in chunks:
+            # sanity check
+            assert chunk.is_gathered
+            assert chunk.torch_pg == head.torch_pg and chunk.dtype == head.dtype
+            assert chunk.keep_gathered == head.keep_gathered
+
+        if comm_dtype == head.dtype:
+            comm_dtype = None
+        if head.pg_size == 1 or (len(chunks) == 1 and comm_dtype is None):
+            for chunk in chunks:
+                chunk.reduce(average)
+            return
+
+        fold_average = average and _is_avg_op_supported(head.torch_pg)
+        op = dist.ReduceOp.AVG if fold_average else dist.ReduceOp.SUM
+
+        # the payloads are only casted for the communication in `comm_dtype`
+        inputs = [
+            chunk.cuda_global_chunk
+            if comm_dtype is None
+            else chunk.cuda_global_chunk.to(comm_dtype)
+            for chunk in chunks
+        ]
+        if head.keep_gathered:
+            with coalescing_manager(head.torch_pg, get_current_device()):
+                for tensor in inputs:
+                    dist.all_reduce(tensor, op=op, group=head.torch_pg)
+            for chunk, tensor in zip(chunks, inputs):
+                if comm_dtype is not None:
+                    chunk.cuda_global_chunk.copy_(tensor)
+                if average and not fold_average:
+                    chunk.cuda_global_chunk.div_(head.pg_size)
+        else:
+            outputs = [
+                torch.empty(
+                    chunk.shard_size, dtype=tensor.dtype, device=get_current_device()
+                )
+                for chunk, tensor in zip(chunks, inputs)
+            ]
+            with coalescing_manager(head.torch_pg, get_current_device()):
+                for output, tensor in zip(outputs, inputs):
+                    reduce_scatter_tensor(output, tensor, op=op, group=head.torch_pg)
+            del inputs
+            for chunk, output in zip(chunks, outputs):
+                if comm_dtype is not None:
+                    output = output.to(head.dtype)
+                if average and not fold_average:
+                    output.div_(head.pg_size)
+                chunk.cuda_shard = output
+                free_storage(chunk.cuda_global_chunk)
+                chunk.is_gathered = False
+
+        for chunk in chunks:
+            chunk.__update_tensors_state(TensorState.HOLD)
+
     def tensor_trans_state(
         self, tensor: torch.Tensor, tensor_state: TensorState
     ) -> None:
@@ -541,6 +649,12 @@ class Chunk:
         """Get the list of tensors in the chunk."""
         return list(self.tensors_info.keys())
 
+    def __get_valid_cuda_tensor(self) -> torch.Tensor:
+        if self.is_gathered:
+            return self.cuda_global_chunk[: self.utilized_size]
+        assert self.cuda_shard is not None  # only valid on CUDA
+        return self.cuda_shard[: self.valid_end]
+
     def __gather(self):
         if not self.is_gathered:
             # sanity check
@@ -594,10 +708,8 @@ class Chunk:
         assert self.is_gathered
         assert type(self.cuda_global_chunk) == torch.Tensor
 
-        for tensor, tensor_info in self.tensors_info.items():
-            tensor.data = self.cuda_global_chunk[
-                tensor_info.offset : tensor_info.end
-            ].view(tensor.shape)
+        for tensor, offset, end, shape in self.tensors_info_list:
+            tensor.data = self.cuda_global_chunk[offset:end].view(shape)
 
     def __update_one_tensor_info(
         self, tensor_info: TensorInfo, next_state: TensorState
@@ -141,30 +141,73 @@ class ChunkManager:
             self.__add_memory_usage(chunk.memory_usage)
 
     def move_chunk(
-        self, chunk: Chunk, device: torch.device, force_copy: bool = False
+        self,
+        chunk: Chunk,
+        device: torch.device,
+        force_copy: bool = False,
+        non_blocking: bool = False,
     ) -> None:
-        """Move the shard of the chunk to the target device."""
+        """Move the shard of the chunk to the target device.
+        If `non_blocking` is True, the copy into a pinned cpu shard is asynchronous.
+        """
         if not chunk.can_move or chunk.device_type == device.type:
             return
         self.__sub_memroy_usage(chunk.memory_usage)
-        chunk.shard_move(device, force_copy)
+        chunk.shard_move(device, force_copy, non_blocking)
         self.__add_memory_usage(chunk.memory_usage)
 
+    def batch_move_chunks(
+        self, chunks: Iterable[Chunk], device: torch.device, force_copy: bool = False
+    ) -> None:
+        """Move the shards of the chunks to the target device, synchronizing with the host only once."""
+        moved = False
+        for chunk in chunks:
+            if not chunk.can_move or chunk.device_type == device.type:
+                continue
+            self.__sub_memroy_usage(chunk.memory_usage)
+            chunk.shard_move(device, force_copy, non_blocking=True)
+            self.__add_memory_usage(chunk.memory_usage)
+            moved = True
+        if moved and device.type == "cpu":
+            torch.cuda.current_stream().synchronize()
+
     def trans_tensor_state(self, tensor: torch.Tensor, state: TensorState) -> None:
         """Transit tensor state according to pre-defined state machine."""
         chunk = self.tensor_chunk_map[tensor]
         chunk.tensor_trans_state(tensor, state)
 
-    def reduce_chunk(self, chunk: Chunk) -> bool:
-        """Reduce or all reduce the chunk."""
+    def reduce_chunk(self, chunk: Chunk, average: bool = False) -> bool:
+        """Reduce or all reduce the chunk, averaging it over the process group if `average` is True."""
         if not chunk.can_reduce:
             return False
         self.__sub_memroy_usage(chunk.memory_usage)
-        chunk.reduce()
+        chunk.reduce(average)
         self.__sub_accessed_chunk(chunk)
         self.__add_memory_usage(chunk.memory_usage)
         return True
 
+    def reduce_chunks(
+        self,
+        chunks: List[Chunk],
+        average: bool = False,
+        comm_dtype: Optional[torch.dtype] = None,
+    ) -> None:
+        """Reduce or all reduce a list of chunks ready for the reduction.
+        Chunks sharing the process group, the data type and the `keep_gathered` flag are reduced together,
+        communicating in `comm_dtype` if it is given.
+        """
+        chunk_groups: Dict[Tuple, List[Chunk]] = dict()
+        for chunk in chunks:
+            assert chunk.can_reduce
+            self.__sub_memroy_usage(chunk.memory_usage)
+            key = (chunk.torch_pg, chunk.dtype, chunk.keep_gathered)
+            chunk_groups.setdefault(key, []).append(chunk)
+        for chunk_group in chunk_groups.values():
+            Chunk.reduce_coalesced(chunk_group, average, comm_dtype)
+        for chunk in chunks:
+            self.__sub_accessed_chunk(chunk)
+            self.__add_memory_usage(chunk.memory_usage)
+
     def fake_release_chunk(self, chunk: Chunk) -> None:
         """Release gathered chunk in a fake mode.
         This function is used for keep-gathered chunk in the inference mode.
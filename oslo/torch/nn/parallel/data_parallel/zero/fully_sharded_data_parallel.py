@@ -14,14 +14,16 @@
 #
 # Modified by EleutherAI on 2023.
 
-import itertools
-from collections import OrderedDict
+from collections import OrderedDict, defaultdict, deque
 from functools import partial
-from typing import Dict, List, Optional
+from typing import Deque, Dict, List, Optional, Tuple
 
+import numpy as np
 import torch
 import torch.distributed as dist
 import torch.nn as nn
+from torch._utils import _flatten_dense_tensors, _unflatten_dense_tensors
+from torch.utils._pytree import tree_flatten, tree_unflatten
 from oslo.torch.utils.logging import DistributedLogger
 
 from oslo.torch.distributed.parallel_context import ParallelContext
@@ -33,6 +35,7 @@ from oslo.torch.nn.parallel.data_parallel.zero.chunk import (
     ChunkManager,
     TensorState,
 )
+from oslo.torch.nn.parallel.data_parallel.zero.chunk.chunk import TensorInfo
 from oslo.torch.nn.parallel.data_parallel.zero.heterogeneous_manager import (
     HeterogeneousMemoryManager,
 )
@@ -60,14 +63,110 @@ except ImportError:
     _EXTRA_STATE_KEY_SUFFIX = "_extra_state"
 
 
+def _coalesced_cast(
+    tensors: List[torch.Tensor], dtype: torch.dtype
+) -> List[torch.Tensor]:
+    """Cast tensors to ``dtype`` with a single kernel per (device, dtype) group.
+
+    Tensors of the same group are concatenated straight into one buffer of the
+    target dtype and returned as contiguous views of it. The views share the
+    storage and the autograd version counter of that buffer, so this is only
+    meant for results owned by the caller, e.g. parameters copied into chunks.
+    Tensors requiring grad are cast one by one, since ``torch.cat`` with ``out``
+    does not support autograd.
+
+    Args:
+        tensors (List[torch.Tensor]): floating point tensors to cast.
+        dtype (torch.dtype): the target data type.
+
+    Returns:
+        List[torch.Tensor]: the casted tensors, in the same order as the inputs.
+    """
+    outputs = list(tensors)
+    groups: Dict[Tuple[torch.device, torch.dtype], List[int]] = defaultdict(list)
+    for idx, tensor in enumerate(tensors):
+        if tensor.dtype == dtype:
+            continue
+        if tensor.requires_grad and torch.is_grad_enabled():
+            outputs[idx] = tensor.to(dtype)
+        else:
+            groups[(tensor.device, tensor.dtype)].append(idx)
+
+    for indices in groups.values():
+        group = [tensors[idx] for idx in indices]
+        if len(group) == 1:
+            outputs[indices[0]] = group[0].to(dtype)
+            continue
+        flat = torch.empty(
+            sum(t.numel() for t in group), dtype=dtype, device=group[0].device
+        )
+        torch.cat([t.reshape(-1) for t in group], out=flat)
+        for idx, casted in zip(indices, _unflatten_dense_tensors(flat, group)):
+            outputs[idx] = casted
+    return outputs
+
+
+def _copy_segments(
+    flat: torch.Tensor, segments: List[Tuple[int, int, torch.Tensor]]
+) -> None:
+    """Copy flat tensors into the segments of a flat tensor, with one copy per contiguous run.
+
+    Args:
+        flat (torch.Tensor): the flat destination tensor.
+        segments (List[Tuple[int, int, torch.Tensor]]): the begin and end offsets in ``flat``
+            and the flat source tensor of each segment, sorted by the offsets.
+    """
+    runs: List[List[Tuple[int, int, torch.Tensor]]] = list()
+    for segment in segments:
+        if runs and runs[-1][-1][1] == segment[0]:
+            runs[-1].append(segment)
+        else:
+            runs.append([segment])
+
+    for run in runs:
+        begin, end = run[0][0], run[-1][1]
+        srcs = [src for _, _, src in run]
+        if flat.device.type != "cpu" and all(src.device.type == "cpu" for src in srcs):
+            # stage the sources in pinned memory, so that they are moved with a single copy
+            staging = torch.empty(end - begin, dtype=flat.dtype, pin_memory=True)
+            torch.cat(srcs, out=staging)
+            flat[begin:end].copy_(staging, non_blocking=True)
+        else:
+            srcs = [src.to(flat.device) for src in srcs]
+            torch.cat(srcs, out=flat[begin:end])
+
+
+def _rebuild_container(container, items, base: type):
+    # not every subclass can be built from a mapping or iterable, e.g. `defaultdict`
+    try:
+        return type(container)(items)
+    except TypeError:
+        return base(items)
+
+
 def _cast_float(args, dtype: torch.dtype):
-    if isinstance(args, torch.Tensor) and torch.is_floating_point(args):
-        args = args.to(dtype)
-    elif isinstance(args, (list, tuple)):
-        args = type(args)(_cast_float(t, dtype) for t in args)
-    elif isinstance(args, dict):
-        args = {k: _cast_float(v, dtype) for k, v in args.items()}
-    return args
+    leaves, spec = tree_flatten(args)
+    casted = False
+    for idx, leaf in enumerate(leaves):
+        if isinstance(leaf, torch.Tensor):
+            if torch.is_floating_point(leaf):
+                # each tensor is cast on its own, since the casted tensors are handed to the user
+                # and should neither alias each other nor lose their memory format
+                leaves[idx] = leaf.to(dtype)
+                casted = True
+        elif isinstance(leaf, dict):
+            # subclasses unknown to pytree, e.g. model outputs, are left as leaves
+            items = {k: _cast_float(v, dtype) for k, v in leaf.items()}
+            leaves[idx] = _rebuild_container(leaf, items, dict)
+            casted = True
+        elif isinstance(leaf, (list, tuple)):
+            items = [_cast_float(v, dtype) for v in leaf]
+            base = list if isinstance(leaf, list) else tuple
+            leaves[idx] = _rebuild_container(leaf, items, base)
+            casted = True
+    if not casted:
+        return args
+    return tree_unflatten(leaves, spec)
 
 
 class _FullyShardedDataParallel(_DistributedDataParallel):
@@ -88,6 +187,12 @@ class _FullyShardedDataParallel(_DistributedDataParallel):
         hidden_dim (int): Hidden dimension for the chunk size search. Defaults to None.
         min_chunk_size_mb (int): Minimum chunk size in MB. Defaults to 32.
         memstats (MemStats): Memory statistics. Defaults to None.
+        reduce_bucket_chunks (int): Number of chunks reduced together in one collective. Defaults to 4.
+            The gathered gradient chunks are held in CUDA memory until their bucket is full,
+            so the peak memory of the backward grows linearly with it.
+        prefetch_depth (int): Number of chunks copied to CUDA ahead of their gathering. Defaults to 2.
+        comm_dtype (Optional[torch.dtype]): Data type of the gradients in the reduction, e.g. torch.bfloat16.
+            Defaults to None, which communicates in the data type of the chunks.
     """
 
     def __init__(
@@ -102,6 +207,9 @@ class _FullyShardedDataParallel(_DistributedDataParallel):
         hidden_dim: Optional[int] = None,
         min_chunk_size_mb: float = 32,
         memstats: Optional[MemStats] = None,
+        reduce_bucket_chunks: int = 4,
+        prefetch_depth: int = 2,
+        comm_dtype: Optional[torch.dtype] = None,
     ) -> None:
         super().__init__(module, parallel_context=parallel_context)
         self.chunk_manager: ChunkManager = init_chunk_manager(
@@ -115,13 +223,33 @@ class _FullyShardedDataParallel(_DistributedDataParallel):
             placement_policy, self.chunk_manager, memstats
         )
         self.force_outputs_fp32 = force_outputs_fp32
-        self.param_op_hook = HeterogeneousZeROHook(self.heterogeneous_manager)
+        self.param_op_hook = HeterogeneousZeROHook(
+            self.heterogeneous_manager, prefetch_depth=prefetch_depth
+        )
         self.fp32_params: List[torch.Tensor] = list()
         self.fp16_params: List[torch.Tensor] = list()
         self.overflow_counter = 0
+        # overflow flags of the reduced chunks, accumulated on CUDA
+        self._overflow_buf = torch.zeros(
+            1, dtype=torch.int32, device=get_current_device()
+        )
+        # squared l2 norm of the gradients, accumulated on CUDA for the gradient clipping
+        self.grad_norm_sqr = torch.zeros(
+            1, dtype=torch.float, device=get_current_device()
+        )
+        self._grad_norm_recorded = False
         self.grads_device: Dict[torch.Tensor, torch.device] = dict()
         self.param2name: Dict[nn.Parameter, str] = dict()
         self.name2param: Dict[str, nn.Parameter] = dict()
+        # chunks ready for the reduction, which are reduced together once the bucket is full
+        self.reduce_bucket_chunks = reduce_bucket_chunks
+        self._pending_chunks: List[Chunk] = list()
+        # reduced chunks whose move to the unpinned cpu memory would block the backward
+        self._deferred_moves: List[Chunk] = list()
+        self.comm_dtype = comm_dtype
+        # streams copying the gathered chunks to the host while saving,
+        # so that the copy of a chunk overlaps with the gathering of the next one
+        self._save_streams = [torch.cuda.Stream() for _ in range(2)]
 
         self._cast_buffers()
         self._logger = DistributedLogger.get_instance(__name__)
@@ -144,6 +272,21 @@ class _FullyShardedDataParallel(_DistributedDataParallel):
 
         for name, param in module.named_parameters():
             self.param2name[param] = name
+        # visit labels of the parameters, used to check whether each parameter is correctly reduced
+        self._param_names: List[str] = list(self.param2name.values())
+        self._param_idx: Dict[int, int] = {
+            id(p): i for i, p in enumerate(self.param2name)
+        }
+        self._ignored_mask = np.array(
+            [is_ddp_ignored(p) for p in self.param2name], dtype=bool
+        )
+        self._reduced = np.zeros(len(self._param_names), dtype=bool)
+        self._fp32_to_name: Dict[torch.Tensor, str] = dict()
+        for p, fp32_p in zip(self.fp16_params, self.fp32_params):
+            if p is not None:
+                self._fp32_to_name[fp32_p] = self.param2name[p]
+        # named parameters used for loading, built on the first load
+        self._cached_named_params: Optional[Dict[str, torch.Tensor]] = None
         for m_name, m_var in module.named_modules():
             for p_name, p_var in m_var.named_parameters(recurse=False):
                 param_name = m_name + "." + p_name if m_name else p_name
@@ -153,6 +296,7 @@ class _FullyShardedDataParallel(_DistributedDataParallel):
         """This function is only triggered for inference."""
         access_list = list(self.chunk_manager.accessed_chunks)
         # we need to scatter all accessed chunks and move them to their original places
+        chunks_by_device: Dict[torch.device, List[Chunk]] = defaultdict(list)
         for chunk in access_list:
             if chunk.keep_gathered:
                 self.chunk_manager.fake_release_chunk(chunk)
@@ -160,7 +304,9 @@ class _FullyShardedDataParallel(_DistributedDataParallel):
                 assert chunk.can_release
                 self.chunk_manager.release_chunk(chunk)
             first_param = next(iter(chunk.tensors_info))
-            self.chunk_manager.move_chunk(chunk, self.grads_device[first_param])
+            chunks_by_device[self.grads_device[first_param]].append(chunk)
+        for device, chunks in chunks_by_device.items():
+            self.chunk_manager.batch_move_chunks(chunks, device)
         assert self.chunk_manager.accessed_mem == 0
         # reset all recorded attributes
         self.heterogeneous_manager.reset_attributes()
@@ -174,7 +320,7 @@ class _FullyShardedDataParallel(_DistributedDataParallel):
                 or not self.heterogeneous_manager.is_warmup()
             ), "You should run a completed iteration as your warmup iter"
 
-        args, kwargs = _cast_float(args, torch.half), _cast_float(kwargs, torch.half)
+        args, kwargs = _cast_float((args, kwargs), torch.half)
 
         self.heterogeneous_manager.pre_iter(*args)
         self.param_op_hook.pre_forward(self.fp16_params)
@@ -197,26 +343,41 @@ class _FullyShardedDataParallel(_DistributedDataParallel):
     def _pre_backward(self):
         # set the context as backward
         self.param_op_hook.toggle_training_phase()
+        self.grad_norm_sqr.zero_()
 
-        # set a visit label for all parameters
-        # the label is used to check whether the parameter is correctly reduced
-        for param in self.param2name:
-            if not is_ddp_ignored(param):
-                setattr(param, "_heterogeneous_reduced", False)
+        # reset the visit labels, ignored parameters are regarded as reduced
+        np.copyto(self._reduced, self._ignored_mask)
 
         self.param_op_hook.pre_backward(self.fp16_params)
 
     def _post_backward(self):
         # reset the context for forward
         self.param_op_hook.toggle_training_phase()
+        # reduce the remaining chunks and wait for all the reductions
+        self._reduce_pending_chunks()
+        torch.cuda.current_stream().wait_stream(self.comm_stream)
+        for chunk in self._deferred_moves:
+            first_param = next(iter(chunk.tensors_info))
+            self.chunk_manager.move_chunk(
+                chunk, self.grads_device[first_param], force_copy=True
+            )
+        self._deferred_moves = list()
+        # synchronize the overflow flags with the host once,
+        # which also waits for the asynchronous moves of the reduced chunks
+        self.overflow_counter += self._overflow_buf.item()
+        self._overflow_buf.zero_()
+        # sum up the norm of the gradients with a single collective
+        if self._grad_norm_recorded:
+            dist.all_reduce(
+                self.grad_norm_sqr,
+                group=self.parallel_context.get_group(ParallelMode.DATA),
+            )
+            self._grad_norm_recorded = False
 
         if self.chunk_manager.accessed_mem != 0:
             error_params = ["Reduction failed at followed parameters:"]
-            for param in self.param2name:
-                if not is_ddp_ignored(param) and not getattr(
-                    param, "_heterogeneous_reduced"
-                ):
-                    error_params.append(self.param2name[param])
+            for idx in np.nonzero(~self._reduced)[0]:
+                error_params.append(self._param_names[idx])
             error_str = "\n\t".join(error_params)
             raise RuntimeError(
                 "ZERO DDP error: the synchronization of gradients doesn't exit properly.",
@@ -231,29 +392,71 @@ class _FullyShardedDataParallel(_DistributedDataParallel):
 
     def grad_handle(self, p, grad):
         self.param_op_hook.post_backward([p])
-        empty_grad = torch.empty_like(grad)
 
-        chunk = self.chunk_manager.get_chunk(p)
-        if chunk.tensors_info[p].state != TensorState.HOLD_AFTER_BWD:
+        chunk = self._p2chunk[id(p)]
+        if self._p2info[id(p)].state != TensorState.HOLD_AFTER_BWD:
             raise RuntimeError(
                 f"Parameter `{self.param2name[p]}` failed at the gradient reduction. "
                 "Some unsupported torch function is operated upon this parameter."
             )
-        self.chunk_manager.trans_tensor_state(p, TensorState.READY_FOR_REDUCE)
+        chunk.tensor_trans_state(p, TensorState.READY_FOR_REDUCE)
         chunk.copy_tensor_to_chunk_slice(p, grad)
-        reduced = self.chunk_manager.reduce_chunk(chunk)
-        if reduced:
-            if chunk.is_gathered:
-                chunk.cuda_global_chunk.div_(chunk.pg_size)
-            else:
-                chunk.cuda_shard.div_(chunk.pg_size)
-            # check overflow elements
-            self.overflow_counter += chunk.has_inf_or_nan
-            # record l2 norm for gradient clipping
-            if chunk.l2_norm_flag:
-                chunk.set_l2_norm()
-            self.chunk_manager.move_chunk(chunk, self.grads_device[p], force_copy=True)
-        return empty_grad
+        self._reduced[self._param_idx[id(p)]] = True
+        # the gradient is kept in the chunk, so the incoming tensor is handed back to autograd
+        # as the placeholder instead of allocating a new one, it's cleared after the backward
+        if not chunk.can_reduce:
+            return grad
+
+        # the gathered chunk is released on the communication stream
+        chunk.cuda_global_chunk.record_stream(self.comm_stream)
+        self._pending_chunks.append(chunk)
+        if len(self._pending_chunks) >= self.reduce_bucket_chunks:
+            self._reduce_pending_chunks()
+        return grad
+
+    def _reduce_pending_chunks(self):
+        if len(self._pending_chunks) == 0:
+            return
+        chunks = self._pending_chunks
+        self._pending_chunks = list()
+
+        # launch the reduction on the communication stream,
+        # so that the rest of the backward computation is not blocked by it
+        self.comm_stream.wait_stream(torch.cuda.current_stream())
+        with torch.cuda.stream(self.comm_stream):
+            self.chunk_manager.reduce_chunks(
+                chunks, average=True, comm_dtype=self.comm_dtype
+            )
+            norm_sqrs: List[torch.Tensor] = list()
+            for chunk in chunks:
+                if chunk.l2_norm_flag:
+                    # record l2 norm for gradient clipping
+                    chunk_norm_sqr = chunk.get_l2_norm_sqr()
+                    if chunk.is_gathered:
+                        # gathered chunks are duplicated on all the ranks,
+                        # so each rank only accounts for its share of them
+                        chunk_norm_sqr.div_(chunk.pg_size)
+                    norm_sqrs.append(chunk_norm_sqr)
+                else:
+                    # check overflow elements
+                    self._overflow_buf.add_(chunk.get_inf_or_nan_flag())
+                first_param = next(iter(chunk.tensors_info))
+                grads_device = self.grads_device[first_param]
+                if grads_device.type == "cpu" and not chunk.pin_memory:
+                    # a copy to the unpinned memory blocks the host until the reduction is done
+                    self._deferred_moves.append(chunk)
+                else:
+                    self.chunk_manager.move_chunk(
+                        chunk, grads_device, force_copy=True, non_blocking=True
+                    )
+            if norm_sqrs:
+                bucket_norm_sqr = torch.stack(norm_sqrs).sum()
+                # a non-finite norm means that there are inf or nan elements
+                self._overflow_buf.add_(
+                    torch.logical_not(torch.isfinite(bucket_norm_sqr)).to(torch.int32)
+                )
+                self.grad_norm_sqr.add_(bucket_norm_sqr)
+                self._grad_norm_recorded = True
 
     def zero_grad(self, set_to_none: bool = False) -> None:
         self.module.zero_grad(set_to_none=True)
@@ -309,23 +512,55 @@ class _FullyShardedDataParallel(_DistributedDataParallel):
         # save parameters
         param_to_save_data = dict()
         chunk_list = self.chunk_manager.get_chunks(param_list)
+        # each save stream owns a pinned staging buffer, which is reused by its chunks
+        num_streams = len(self._save_streams)
+        host_bufs: List[Optional[torch.Tensor]] = [None] * num_streams
+        pending: Deque[Tuple[Chunk, torch.Tensor, torch.cuda.Event]] = deque()
+
+        def record_chunk(chunk, host_chunk, event):
+            event.synchronize()
+            for tensor, offset, end, shape in chunk.tensors_info_list:
+                assert tensor not in param_to_save_data
+                param_to_save_data[tensor] = host_chunk[offset:end].view(shape).clone()
+
+        num_copies = 0
         for chunk in chunk_list:
             temp_chunk = get_temp_total_chunk_on_cuda(chunk)
+            record_flag = (not only_rank_0) | (dist.get_rank(chunk.torch_pg) == 0)
+            if not record_flag:
+                for tensor in chunk.tensors_info:
+                    assert tensor not in param_to_save_data
+                    param_to_save_data[tensor] = torch.empty([0])
+                del temp_chunk
+                continue
 
-            for tensor, tensor_info in chunk.tensors_info.items():
-                record_tensor = torch.empty([0])
-                record_flag = (not only_rank_0) | (dist.get_rank(chunk.torch_pg) == 0)
-                if record_flag:
-                    record_tensor = (
-                        temp_chunk[tensor_info.offset : tensor_info.end]
-                        .view(tensor.shape)
-                        .cpu()
-                    )
-
-                assert tensor not in param_to_save_data
-                param_to_save_data[tensor] = record_tensor
-
+            # the oldest copy uses the same staging buffer, so it should be finished first
+            if len(pending) == num_streams:
+                record_chunk(*pending.popleft())
+            slot = num_copies % num_streams
+            num_copies += 1
+            host_buf = host_bufs[slot]
+            if (
+                host_buf is None
+                or host_buf.dtype != temp_chunk.dtype
+                or host_buf.numel() < chunk.utilized_size
+            ):
+                host_buf = torch.empty(
+                    chunk.chunk_size, dtype=temp_chunk.dtype, pin_memory=True
+                )
+                host_bufs[slot] = host_buf
+            host_chunk = host_buf[: chunk.utilized_size]
+
+            stream = self._save_streams[slot]
+            stream.wait_stream(torch.cuda.current_stream())
+            with torch.cuda.stream(stream):
+                host_chunk.copy_(temp_chunk[: chunk.utilized_size], non_blocking=True)
+            temp_chunk.record_stream(stream)
+            pending.append((chunk, host_chunk, stream.record_event()))
             del temp_chunk
+
+        while pending:
+            record_chunk(*pending.popleft())
         return param_to_save_data
 
     def _save_to_state_dict(self, destination, prefix, keep_vars, only_rank_0=True):
@@ -450,6 +685,30 @@ class _FullyShardedDataParallel(_DistributedDataParallel):
             )
         return _IncompatibleKeys(missing_keys, unexpected_keys)
 
+    def _get_local_state(self) -> Tuple[Dict, Dict]:
+        """
+        Get the persistent buffers and the local states of this module.
+        Only the parameters are cached, since they are fixed once the chunks are built.
+        The buffers are collected on every call, because they can be reassigned after the wrapping.
+
+        Returns:
+            Tuple[Dict, Dict]: the persistent buffers and the local states, keyed by names
+        """
+        if self._cached_named_params is None:
+            self._cached_named_params = {
+                k: v for k, v in self.named_parameters() if v is not None
+            }
+        persistent_buffers = {
+            k: v
+            for k, v in self.named_buffers()
+            if k not in self._non_persistent_buffers_set
+        }
+        local_state = dict(self._cached_named_params)
+        local_state.update(
+            {k: v for k, v in persistent_buffers.items() if v is not None}
+        )
+        return persistent_buffers, local_state
+
     def _load_from_state_dict(
         self,
         state_dict,
@@ -502,15 +761,7 @@ class _FullyShardedDataParallel(_DistributedDataParallel):
                 error_msgs,
             )
 
-        persistent_buffers = {
-            k: v
-            for k, v in self.named_buffers()
-            if k not in self._non_persistent_buffers_set
-        }
-        local_name_params = itertools.chain(
-            self.named_parameters(), persistent_buffers.items()
-        )
-        local_state = {k: v for k, v in local_name_params if v is not None}
+        persistent_buffers, local_state = self._get_local_state()
 
         def load(param_name, dest_tensor, copy_func):
             state_key = prefix + param_name
@@ -543,7 +794,12 @@ class _FullyShardedDataParallel(_DistributedDataParallel):
             elif strict:
                 missing_keys.append(state_key)
 
-        def load_fp32_parameter(chunk_slice, data):
+        def load_fp32_parameter(segments, loaded, name, tensor, offset, end, data):
+            # the copies are deferred and issued at once for each chunk
+            segments.append((offset, end, data.flatten()))
+            loaded.append((name, tensor))
+
+        def copy_fp32_parameter(chunk_slice, data):
             chunk_slice.copy_(data.flatten())
 
         for name, param in self.named_parameters():
@@ -551,24 +807,37 @@ class _FullyShardedDataParallel(_DistributedDataParallel):
                 # deal with ddp ignored parameters
                 load(name, param, param.copy_)
 
-        fp32_to_name = dict()
-        for p, fp32_p in zip(self.fp16_params, self.fp32_params):
-            if p is not None:
-                name = self.param2name[p]
-                fp32_to_name[fp32_p] = name
-
         chunk_list = self.chunk_manager.get_chunks(self.fp32_params)
         for chunk in chunk_list:
             temp_chunk = get_temp_total_chunk_on_cuda(chunk)
 
-            for tensor, tensor_info in chunk.tensors_info.items():
-                parameter_name = fp32_to_name[tensor]
-                parameter_slice = temp_chunk[tensor_info.offset : tensor_info.end]
+            segments: List[Tuple[int, int, torch.Tensor]] = list()
+            loaded: List[Tuple[str, torch.Tensor]] = list()
+            for tensor, offset, end, _ in chunk.tensors_info_list:
+                parameter_name = self._fp32_to_name[tensor]
                 load(
                     parameter_name,
                     tensor,
-                    partial(load_fp32_parameter, parameter_slice),
+                    partial(
+                        load_fp32_parameter,
+                        segments,
+                        loaded,
+                        parameter_name,
+                        tensor,
+                        offset,
+                        end,
+                    ),
                 )
+            try:
+                _copy_segments(temp_chunk, segments)
+            except Exception:
+                # copy the parameters one by one, so that the failed ones are reported in `error_msgs`
+                for (offset, end, _), (parameter_name, tensor) in zip(segments, loaded):
+                    load(
+                        parameter_name,
+                        tensor,
+                        partial(copy_fp32_parameter, temp_chunk[offset:end]),
+                    )
 
             if chunk.is_gathered:
                 chunk.cuda_global_chunk.copy_(temp_chunk)
@@ -608,6 +877,45 @@ class _FullyShardedDataParallel(_DistributedDataParallel):
                         unexpected_keys.append(key)
 
     def _init_chunks(self, param_order, cpu_offload: bool, pin_memory: bool):
+        dp_world_size = self.parallel_context.get_world_size(ParallelMode.DATA)
+
+        def register_params(params: List[nn.Parameter]):
+            # create fp16 parameters with one cast per device
+            fp16_data_list = _coalesced_cast([p.data for p in params], torch.half)
+            for p, fp16_data in zip(params, fp16_data_list):
+                # create a fp32 parameter
+                fp32_data = p.data.float()
+                fp32_p = torch.Tensor(fp32_data)
+                # create a fp16 parameter
+                p.data = fp16_data
+
+                # register the fp16 parameter and fp32 parameter in the chunk manager
+                self.chunk_manager.register_tensor(
+                    tensor=p,
+                    group_type="fp16_param",
+                    config_key=dp_world_size,
+                    parallel_context=self.parallel_context,
+                    cpu_offload=cpu_offload,
+                    pin_memory=pin_memory,
+                )
+                self.chunk_manager.register_tensor(
+                    tensor=fp32_p,
+                    group_type="fp32_param",
+                    config_key=dp_world_size,
+                    parallel_context=self.parallel_context,
+                    cpu_offload=cpu_offload,
+                    pin_memory=pin_memory,
+                )
+
+                self.fp16_params.append(p)
+                self.fp32_params.append(fp32_p)
+                self.grads_device[p] = self.heterogeneous_manager.default_device
+
+        # the parameters are casted in batches of about one chunk,
+        # which bounds the memory held by the casted copies
+        batch_size = self.chunk_manager.dp_degree_chunk_size_dict[dp_world_size]
+        param_batch: List[nn.Parameter] = list()
+        batch_numel = 0
         for p in param_order.generate():
             # ignore the parameters with no gradient
             if not p.requires_grad:
@@ -618,48 +926,61 @@ class _FullyShardedDataParallel(_DistributedDataParallel):
                 p.data = p.data.to(device=get_current_device(), dtype=torch.float16)
                 continue
 
-            # create a fp32 parameter
-            fp32_data = p.data.float()
-            fp32_p = torch.Tensor(fp32_data)
-            # create a fp16 parameter
-            p.data = p.data.half()
-
-            # register the fp16 parameter and fp32 parameter in the chunk manager
-            dp_world_size = self.parallel_context.get_world_size(ParallelMode.DATA)
-            self.chunk_manager.register_tensor(
-                tensor=p,
-                group_type="fp16_param",
-                config_key=dp_world_size,
-                parallel_context=self.parallel_context,
-                cpu_offload=cpu_offload,
-                pin_memory=pin_memory,
-            )
-            self.chunk_manager.register_tensor(
-                tensor=fp32_p,
-                group_type="fp32_param",
-                config_key=dp_world_size,
-                parallel_context=self.parallel_context,
-                cpu_offload=cpu_offload,
-                pin_memory=pin_memory,
-            )
-
-            self.fp16_params.append(p)
-            self.fp32_params.append(fp32_p)
-            self.grads_device[p] = self.heterogeneous_manager.default_device
+            param_batch.append(p)
+            batch_numel += p.numel()
+            if batch_numel >= batch_size:
+                register_params(param_batch)
+                param_batch = list()
+                batch_numel = 0
+        register_params(param_batch)
 
         self.chunk_manager.close_all_groups()
 
+        # snapshot of the chunks and the tensor information used in the gradient hooks
+        self._p2chunk: Dict[int, Chunk] = dict()
+        self._p2info: Dict[int, TensorInfo] = dict()
         for p, fp32_p in zip(self.fp16_params, self.fp32_params):
             chunk_16 = self.chunk_manager.get_chunk(p)
             chunk_32 = self.chunk_manager.get_chunk(fp32_p)
             chunk_32.init_pair(chunk_16)
+            self._p2chunk[id(p)] = chunk_16
+            self._p2info[id(p)] = chunk_16.tensors_info[p]
 
             # keep gathered chunks are in CUDA
             if chunk_16.keep_gathered:
                 self.grads_device[p] = get_current_device()
 
     def _cast_buffers(self):
+        device = get_current_device()
+        buffer_groups: Dict[
+            Tuple[torch.device, torch.dtype], List[torch.Tensor]
+        ] = defaultdict(list)
         for buffer in self.module.buffers():
-            buffer.data = buffer.cuda()
-            if torch.is_floating_point(buffer):
-                buffer.data = buffer.half()
+            buffer_groups[(buffer.device, buffer.dtype)].append(buffer)
+
+        for (buffer_device, buffer_dtype), buffers in buffer_groups.items():
+            is_floating = buffer_dtype.is_floating_point
+            if buffer_device == device and (
+                not is_floating or buffer_dtype == torch.half
+            ):
+                continue
+
+            # move the buffers of the same kind with a single copy,
+            # staged in pinned memory when they come from CPU
+            if buffer_device.type == "cpu":
+                flat = torch.empty(
+                    sum(buffer.numel() for buffer in buffers),
+                    dtype=buffer_dtype,
+                    pin_memory=True,
+                )
+                torch.cat([buffer.data.reshape(-1) for buffer in buffers], out=flat)
+            else:
+                flat = _flatten_dense_tensors([buffer.data for buffer in buffers])
+            # move and cast at once, without an intermediate copy on the device
+            flat = flat.to(
+                device,
+                dtype=torch.half if is_floating else buffer_dtype,
+                non_blocking=True,
+            )
+            for buffer, data in zip(buffers, _unflatten_dense_tensors(flat, buffers)):
+                buffer.data = data
@@ -15,16 +15,18 @@
 # Modified by EleutherAI on 2023.
 
 from enum import Enum
-from typing import List
+from typing import Dict, List
 
 import torch
 
 from oslo.torch.nn.parallel.data_parallel.zero.chunk import (
+    Chunk,
     TensorState,
 )
 from oslo.torch.nn.parallel.data_parallel.zero.heterogeneous_manager import (
     HeterogeneousMemoryManager,
 )
+from oslo.torch.nn.parallel.data_parallel.zero.utils import get_current_device
 from oslo.torch.nn.parallel.data_parallel._utils import is_ddp_ignored
 
 
@@ -34,11 +36,24 @@ class TrainingPhase(Enum):
 
 
 class HeterogeneousZeROHook:
-    def __init__(self, heterogeneous_manager: HeterogeneousMemoryManager) -> None:
+    """
+    Hook accessing the chunks of the parameters around their computation.
+
+    Args:
+        heterogeneous_manager (HeterogeneousMemoryManager): A ``HeterogeneousMemoryManager`` instance.
+        prefetch_depth (int): The number of chunks whose copy to CUDA is issued ahead of their gathering.
+            Defaults to 2.
+    """
+
+    def __init__(
+        self, heterogeneous_manager: HeterogeneousMemoryManager, prefetch_depth: int = 2
+    ) -> None:
         super().__init__()
         self._heterogeneous_manager = heterogeneous_manager
         self._chunk_manager = heterogeneous_manager.chunk_manager
         self._training_phase = TrainingPhase.FORWARD
+        self._prefetch_depth = prefetch_depth
+        self._prefetch_stream: torch.cuda.Stream = torch.cuda.Stream()
 
     def pre_op(self, params):
         params = [p for p in params if not is_ddp_ignored(p)]
@@ -47,12 +62,33 @@ class HeterogeneousZeROHook:
             self._chunk_manager.trans_tensor_state(p, TensorState.COMPUTE)
         self._heterogeneous_manager.sample_overall_data()
         self._heterogeneous_manager.adjust_layout(chunks)
-        for chunk in chunks:
+
+        # copy the chunks resident on CPU to CUDA a few chunks ahead,
+        # so that the copies overlap with the gathering of the previous chunks
+        prefetch_events: Dict[Chunk, torch.cuda.Event] = dict()
+        for chunk in chunks[: self._prefetch_depth]:
+            self._prefetch_chunk(chunk, prefetch_events)
+        for idx, chunk in enumerate(chunks):
+            if idx + self._prefetch_depth < len(chunks):
+                self._prefetch_chunk(
+                    chunks[idx + self._prefetch_depth], prefetch_events
+                )
+            if chunk in prefetch_events:
+                current_stream = torch.cuda.current_stream()
+                current_stream.wait_event(prefetch_events.pop(chunk))
+                chunk.cuda_shard.record_stream(current_stream)
             self._chunk_manager.access_chunk(chunk)
 
         # record cuda model data of the current OP
         self._heterogeneous_manager.record_model_data_volume()
 
+    def _prefetch_chunk(self, chunk: Chunk, events: Dict[Chunk, torch.cuda.Event]):
+        if chunk.device_type != "cpu":
+            return
+        with torch.cuda.stream(self._prefetch_stream):
+            self._chunk_manager.move_chunk(chunk, get_current_device())
+            events[chunk] = self._prefetch_stream.record_event()
+
     def post_op(self, params):
         params = [p for p in params if not is_ddp_ignored(p)]
         for p in params:
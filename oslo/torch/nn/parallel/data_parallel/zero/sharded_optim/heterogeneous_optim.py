@@ -184,30 +184,12 @@ class _HeterogeneousZeroOptimizer(BaseOptimizerWrapper):
         return self._found_overflow.item() > 0
 
     def _clear_global_norm(self) -> None:
-        for c16 in self.chunk16_set:
-            c16.l2_norm = None
+        self.module.grad_norm_sqr.zero_()
 
     def _calc_global_norm(self) -> float:
-        norm_sqr: float = 0.0
-        group_to_norm = dict()
-        for c16 in self.chunk16_set:
-            assert c16.l2_norm is not None
-
-            if c16.is_gathered:
-                norm_sqr += c16.l2_norm
-            else:
-                # this chunk is sharded, use communication to collect total norm
-                if c16.torch_pg not in group_to_norm:
-                    group_to_norm[c16.torch_pg] = 0.0
-                group_to_norm[c16.torch_pg] += c16.l2_norm
-
-            c16.l2_norm = None  # clear l2 norm
-
-        comm_buffer = torch.zeros(1, dtype=torch.float, device=get_current_device())
-        for group, part_norm in group_to_norm.items():
-            comm_buffer.fill_(part_norm)
-            dist.all_reduce(comm_buffer, group=group)
-            norm_sqr += comm_buffer.item()
+        # the squared norm is accumulated and all-reduced by the module during backward
+        norm_sqr = self.module.grad_norm_sqr.item()
+        self._clear_global_norm()
 
         global_norm = math.sqrt(norm_sqr)
         return global_norm
@@ -1,7 +1,10 @@
+import contextlib
+import inspect
+
 import torch
 import torch.distributed as dist
 
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, ContextManager
 
 if TYPE_CHECKING:
     from oslo.torch.nn.parallel.data_parallel.zero.chunk import Chunk
@@ -25,12 +28,60 @@ def get_temp_total_chunk_on_cuda(chunk: "Chunk") -> torch.Tensor:
     if chunk.cuda_shard is not None:
         shard_temp = chunk.cuda_shard
     else:
-        shard_temp = chunk.cpu_shard.to(get_current_device())
+        shard_temp = chunk.cpu_shard.to(
+            get_current_device(), non_blocking=chunk.pin_memory
+        )
 
-    total_temp = torch.zeros(
+    total_temp = torch.empty(
         chunk.chunk_size, dtype=chunk.dtype, device=get_current_device()
     )
-    gather_list = list(torch.chunk(input=total_temp, chunks=chunk.pg_size, dim=0))
-    dist.all_gather(tensor_list=gather_list, tensor=shard_temp, group=chunk.torch_pg)
+    all_gather_into_tensor(total_temp, shard_temp, group=chunk.torch_pg)
 
     return total_temp
+
+
+def all_gather_into_tensor(
+    output: torch.Tensor,
+    input: torch.Tensor,
+    group=None,
+) -> None:
+    """
+    Gather the input tensors of the group into the flat output tensor in the rank order.
+    Falls back to the private API for the PyTorch versions without ``all_gather_into_tensor``.
+    """
+    if hasattr(dist, "all_gather_into_tensor"):
+        dist.all_gather_into_tensor(output, input, group=group)
+    else:
+        dist._all_gather_base(output, input, group=group)
+
+
+def reduce_scatter_tensor(
+    output: torch.Tensor,
+    input: torch.Tensor,
+    op=dist.ReduceOp.SUM,
+    group=None,
+) -> None:
+    """
+    Reduce the flat input tensor across the group and scatter it evenly to the output tensors.
+    Falls back to the private API for the PyTorch versions without ``reduce_scatter_tensor``.
+    """
+    if hasattr(dist, "reduce_scatter_tensor"):
+        dist.reduce_scatter_tensor(output, input, op=op, group=group)
+    else:
+        dist._reduce_scatter_base(output, input, op=op, group=group)
+
+
+def coalescing_manager(group, device: torch.device) -> ContextManager:
+    """
+    Group the collectives issued in the context, so that NCCL launches them together.
+    Falls back to issuing them one by one for the other backends and the PyTorch versions
+    without the public-like ``_coalescing_manager``.
+    """
+    manager = getattr(dist, "_coalescing_manager", None)
+    if (
+        manager is None
+        or "async_ops" not in inspect.signature(manager).parameters
+        or dist.get_backend(group) != dist.Backend.NCCL
+    ):
+        return contextlib.nullcontext()
+    return manager(group=group, device=device)
@@ -0,0 +1,83 @@
+from functools import partial
+
+import pytest
+import torch
+import torch.multiprocessing as mp
+import os
+
+from oslo.torch.nn.parallel.data_parallel.zero.chunk import (
+    TensorState,
+    Chunk,
+)
+from oslo.torch.distributed.parallel_context import ParallelContext
+from oslo.torch.utils import get_free_port
+
+import itertools
+
+skip_if_dist_unavailable = pytest.mark.skipif(
+    torch.cuda.device_count() < 2, reason="dist required"
+)
+
+
+def make_ready_chunks(parallel_context, keep_gathered, num_chunks=3):
+    chunks = []
+    for _ in range(num_chunks):
+        chunk = Chunk(
+            chunk_size=64,
+            parallel_context=parallel_context,
+            dtype=torch.float32,
+            keep_gathered=keep_gathered,
+        )
+        params = [torch.randn(5, 3, device="cuda"), torch.randn(20, device="cuda")]
+        for param in params:
+            chunk.append_tensor(param)
+        chunk.close_chunk()
+        chunk.access_chunk()
+        for param in params:
+            chunk.tensor_trans_state(param, TensorState.COMPUTE)
+            chunk.tensor_trans_state(param, TensorState.HOLD_AFTER_BWD)
+            chunk.tensor_trans_state(param, TensorState.READY_FOR_REDUCE)
+        assert chunk.can_reduce
+        chunks.append(chunk)
+    return chunks
+
+
+def exam_reduce_coalesced(parallel_context, keep_gathered, average):
+    rank = torch.distributed.get_rank()
+    torch.manual_seed(rank)
+    expected_chunks = make_ready_chunks(parallel_context, keep_gathered)
+    torch.manual_seed(rank)
+    chunks = make_ready_chunks(parallel_context, keep_gathered)
+
+    for chunk in expected_chunks:
+        chunk.reduce(average)
+    Chunk.reduce_coalesced(chunks, average)
+
+    for chunk, expected in zip(chunks, expected_chunks):
+        assert chunk.is_gathered == expected.is_gathered
+        assert chunk.device_type == expected.device_type
+        assert chunk.tensor_state_cnter[TensorState.HOLD] == chunk.num_tensors
+        assert torch.allclose(chunk.payload, expected.payload)
+        assert chunk.payload.numel() == expected.payload.numel()
+
+
+def run_dist(rank, world_size):
+    os.environ["RANK"] = str(rank)
+    os.environ["LOCAL_RANK"] = str(rank)
+    parallel_context = ParallelContext.from_torch(data_parallel_size=world_size)
+
+    keep_gathered = [True, False]
+    average = [True, False]
+
+    for args in itertools.product(keep_gathered, average):
+        exam_reduce_coalesced(parallel_context, *args)
+
+
+@skip_if_dist_unavailable
+def test_reduce_coalesced():
+    world_size = 2
+    os.environ["WORLD_SIZE"] = str(world_size)
+    os.environ["LOCAL_WORLD_SIZE"] = str(world_size)
+    os.environ["MASTER_ADDR"] = "localhost"
+    os.environ["MASTER_PORT"] = str(get_free_port())
+    mp.spawn(partial(run_dist, world_size=world_size), nprocs=world_size)
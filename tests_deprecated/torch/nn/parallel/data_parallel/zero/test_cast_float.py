@@ -0,0 +1,69 @@
+from collections import OrderedDict, defaultdict
+
+import torch
+
+from oslo.torch.nn.parallel.data_parallel.zero.fully_sharded_data_parallel import (
+    _cast_float,
+    _coalesced_cast,
+)
+
+
+def test_cast_float_dtype():
+    x = torch.randn(4)
+    index = torch.arange(3)
+    casted_x, casted_index = _cast_float((x, index), torch.half)
+    assert casted_x.dtype == torch.half
+    assert torch.equal(casted_x, x.half())
+    assert casted_index is index
+
+
+def test_cast_float_no_alias():
+    x = torch.randn(4, 4)
+    m = torch.randn(4, 4)
+    w = torch.randn(4, 4, dtype=torch.half, requires_grad=True)
+    casted_x, casted_m = _cast_float((x, m), torch.half)
+    z = (casted_x * w).sum()
+    # an in-place update of one input must not invalidate the other one saved for backward
+    casted_m.add_(1)
+    z.backward()
+    assert torch.equal(w.grad, casted_x)
+
+
+def test_cast_float_memory_format():
+    x = torch.randn(2, 3, 4, 4).to(memory_format=torch.channels_last)
+    y = torch.randn(2, 3, 4, 4).to(memory_format=torch.channels_last)
+    for casted in _cast_float([x, y], torch.half):
+        assert casted.is_contiguous(memory_format=torch.channels_last)
+
+
+def test_coalesced_cast():
+    tensors = [torch.randn(2, 3), torch.randn(5), torch.randn(1, dtype=torch.half)]
+    casted = _coalesced_cast(tensors, torch.half)
+    for tensor, casted_tensor in zip(tensors, casted):
+        assert casted_tensor.dtype == torch.half
+        assert casted_tensor.shape == tensor.shape
+        assert torch.equal(casted_tensor, tensor.half())
+    assert casted[2] is tensors[2]
+
+
+class ModelOutput(OrderedDict):
+    pass
+
+
+def test_cast_float_dict_subclass():
+    output = ModelOutput(logits=torch.randn(2, dtype=torch.half), labels=[1, 2])
+    casted = _cast_float(output, torch.float)
+    assert isinstance(casted, ModelOutput)
+    assert casted["logits"].dtype == torch.float
+    assert casted["labels"] == [1, 2]
+
+
+class DefaultOutput(defaultdict):
+    pass
+
+
+def test_cast_float_unbuildable_subclass():
+    output = DefaultOutput(list, logits=torch.randn(2, dtype=torch.half))
+    casted = _cast_float(output, torch.float)
+    assert isinstance(casted, dict)
+    assert casted["logits"].dtype == torch.float